@@ -2,18 +2,23 @@ from __future__ import annotations
 
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List
 
 from airflow import DAG
-from airflow.operators.python import PythonOperator
+
+try:
+    from airflow.sdk import Asset, task
+except ImportError:                                 # Airflow 2.x
+    from airflow.datasets import Dataset as Asset
+    from airflow.decorators import task
 
 import sys, os
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
 
 from config   import CHUNK_ROWS, TMP_DIR
 from extract  import extract_to_parquet
-from transform import transform_parquet_chunks
-from load     import copy_parquet_chunks
+from transform import transform_chunk
+from load     import (copy_parquet_chunks, create_table,
+                      drop_secondary_indexes, create_indexes)
 
 START_DATE = "2020-01-01"
 END_DATE   = "2025-06-30"
@@ -29,22 +34,61 @@ default_args = {
 RAW_DIR      = TMP_DIR / "raw"
 CLEAN_DIR    = TMP_DIR / "clean"
 
-def extract_task(**_):
+# lineage for the stage directories
+RAW_ASSET    = Asset(f"file://{RAW_DIR}")
+CLEAN_ASSET  = Asset(f"file://{CLEAN_DIR}")
+
+CHUNK_GLOB   = "chunk_*.parquet"
+
+# one mapped task instance per chunk; cap how many run at once
+MAX_PARALLEL_TRANSFORMS = 16
+MAX_PARALLEL_LOADS      = 4     # each holds a Postgres connection
+
+def _chunks(d: Path) -> list[Path]:
+    # clean chunks sit in year=/month= partition directories
+    return sorted(d.rglob(CHUNK_GLOB))
+
+def _clear(d: Path) -> None:
+    # drop chunks left by an earlier run
+    for p in _chunks(d):
+        p.unlink()
+
+@task(task_id="extract", outlets=[RAW_ASSET])
+def extract() -> list[str]:
     """Page through Socrata and write raw Parquet chunks."""
+    _clear(RAW_DIR)
+    _clear(CLEAN_DIR)
     paths = extract_to_parquet(START_DATE, END_DATE, RAW_DIR)
-    # return list of str, not Path (XCom must be JSON-serialisable)
+    # small list of names – the mapping source for transform and load
     return [str(p) for p in paths]
 
-def transform_task(ti, **_):
-    raw_paths: List[str] = ti.xcom_pull(task_ids="extract")
-    clean_paths = transform_parquet_chunks(
-        [Path(p) for p in raw_paths], CLEAN_DIR
-    )
-    return [str(p) for p in clean_paths]
+@task(task_id="transform", inlets=[RAW_ASSET], outlets=[CLEAN_ASSET],
+      max_active_tis_per_dag=MAX_PARALLEL_TRANSFORMS)
+def transform_one(path: str) -> list[str]:
+    # one file per (year, month) partition the chunk touches
+    return [str(p) for p in transform_chunk(Path(path), CLEAN_DIR)]
+
+@task(task_id="create_table")
+def create_table_task() -> None:
+    # once, after every transform, so parallel loads never race on CREATE
+    # TABLE; secondary indexes are dropped here (their definitions saved
+    # in Postgres) and rebuilt once after every chunk is in
+    create_table()
+    drop_secondary_indexes()
 
-def load_task(ti, **_):
-    clean_paths: List[str] = ti.xcom_pull(task_ids="transform")
-    copy_parquet_chunks([Path(p) for p in clean_paths])
+@task(task_id="load", inlets=[CLEAN_ASSET],
+      max_active_tis_per_dag=MAX_PARALLEL_LOADS)
+def load_one(paths: list[str]) -> None:
+    # own connection and COPY per chunk; DDL and index handling live in
+    # create_table / rebuild_indexes, so loads never serialise on locks
+    copy_parquet_chunks([Path(p) for p in paths],
+                        rebuild_indexes=False, run_ddl=False)
+
+@task(task_id="rebuild_indexes", trigger_rule="all_done")
+def rebuild_indexes_task() -> None:
+    # all_done: put the indexes back even if some loads failed; anything a
+    # failed run left behind is restored here too
+    create_indexes()
 
 with DAG(
     dag_id="iowa_liquor_etl_pipeline",
@@ -56,19 +100,12 @@ with DAG(
     tags=["iowa", "liquor", "etl"],
 ) as dag:
 
-    extract = PythonOperator(
-        task_id="extract",
-        python_callable=extract_task,
-    )
-
-    transform = PythonOperator(
-        task_id="transform",
-        python_callable=transform_task,
-    )
+    raw_paths   = extract()
+    clean_paths = transform_one.expand(path=raw_paths)
 
-    load = PythonOperator(
-        task_id="load",
-        python_callable=load_task,
-    )
+    prepare     = create_table_task()
+    loads       = load_one.expand(paths=clean_paths)
 
-    extract >> transform >> load
+    # indexes go only once extract and transform are done, right before
+    # the loads
+    clean_paths >> prepare >> loads >> rebuild_indexes_task()
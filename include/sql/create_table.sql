@@ -24,3 +24,10 @@ CREATE TABLE IF NOT EXISTS iowa_liquor_sales (
     sale_liters NUMERIC,
     sale_gallons NUMERIC
 );
+
+-- secondary-index definitions dropped for a parallel load, kept until
+-- they are rebuilt (see src/load.py: drop_secondary_indexes)
+CREATE TABLE IF NOT EXISTS etl_dropped_indexes (
+    table_name TEXT NOT NULL,
+    ddl TEXT NOT NULL
+);
@@ -17,5 +17,18 @@ POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
 
 # –– ETL tuning ––
 CHUNK_ROWS = int(os.getenv("CHUNK_ROWS", 50_000))
+BATCH_ROWS = int(os.getenv("BATCH_ROWS", 16_384))
 TMP_DIR    = Path(os.getenv("TMP_DIR", "/tmp/iowa_liquor_etl"))
 TMP_DIR.mkdir(parents=True, exist_ok=True)
+
+TRANSFORM_WORKERS = int(os.getenv("TRANSFORM_WORKERS", os.cpu_count() or 1))
+FETCH_WORKERS     = int(os.getenv("FETCH_WORKERS", 8))
+
+# Parquet writer settings shared by the extract and transform stages
+PARQUET_WRITE_OPTS = dict(
+    compression="zstd",
+    compression_level=3,
+    use_dictionary=True,
+    data_page_size=1 << 20,
+    write_statistics=True,
+)
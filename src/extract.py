@@ -5,32 +5,107 @@ Stream-extract Iowa Liquor Sales → Parquet chunk files.
 from __future__ import annotations
 
 import gzip
-from io import StringIO
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
 from typing import Iterator, List
 
-import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-from src.config import IOWA_LIQUOR_API, CHUNK_ROWS, TMP_DIR
+from src.config import (
+    IOWA_LIQUOR_API, CHUNK_ROWS, BATCH_ROWS, FETCH_WORKERS, TMP_DIR,
+    PARQUET_WRITE_OPTS,
+)
+from src.schema import CAT_COLS, TEXT_COLS
 
+_READ_OPTS    = pv.ReadOptions(block_size=8 << 20, use_threads=True)
+_CONVERT_OPTS = pv.ConvertOptions(
+    # pin every TEXT column – left to inference, each page guesses its own
+    # type and chunks of one dataset disagree (int64 vs string zipcode)
+    column_types={
+        "date": pa.timestamp("us"),
+        **{c: pa.string() for c in TEXT_COLS + CAT_COLS},
+    },
+    # Socrata quotes every field, so "" is how it spells NULL
+    strings_can_be_null=True,
+)
 
-def _fetch_page(start: str, end: str, offset: int) -> pd.DataFrame:
+
+# one pooled keep-alive session for every page – saves a TCP+TLS handshake
+# per request; requests inflates the gzip body transparently
+_ADAPTER = HTTPAdapter(
+    pool_maxsize=max(FETCH_WORKERS, 1),     # one connection per fetch thread
+    max_retries=Retry(total=3, backoff_factor=0.5,
+                      status_forcelist=[429, 500, 502, 503, 504]),
+)
+_SESSION = requests.Session()
+_SESSION.headers.update({"Accept-Encoding": "gzip"})
+_SESSION.mount("https://", _ADAPTER)
+_SESSION.mount("http://", _ADAPTER)
+
+
+def _where(start: str, end: str) -> str:
+    return f"date BETWEEN '{start}T00:00:00' AND '{end}T23:59:59'"
+
+
+def _count_rows(start: str, end: str) -> int:
+    params = {
+        "$select": "count(*) AS n",
+        "$where":  _where(start, end),
+    }
+    r = _SESSION.get(IOWA_LIQUOR_API, params=params, timeout=60)
+    r.raise_for_status()
+    return pv.read_csv(pa.py_buffer(r.content))["n"][0].as_py()
+
+
+def _fetch_page(start: str, end: str, offset: int) -> pa.Table:
     params = {
         "$select": "*",
-        "$where": f"date BETWEEN '{start}T00:00:00' AND '{end}T23:59:59'",
+        "$where":  _where(start, end),
+        # a stable sort order keeps concurrent $offset pages disjoint
+        "$order":  ":id",
         "$limit":  CHUNK_ROWS,
         "$offset": offset,
     }
-    r = requests.get(IOWA_LIQUOR_API, params=params, timeout=60)
+    r = _SESSION.get(IOWA_LIQUOR_API, params=params, timeout=60)
     r.raise_for_status()
-    return pd.read_csv(
-        StringIO(r.text),
-        low_memory=False,
-        parse_dates=["date"],
+    # parse the raw body with Arrow's multi-threaded reader – no str copy
+    return pv.read_csv(
+        pa.py_buffer(r.content),
+        read_options=_READ_OPTS,
+        convert_options=_CONVERT_OPTS,
     )
 
 
+def iter_pages(start: str, end: str) -> Iterator[pa.Table]:
+    """
+    Yield one Arrow table per Socrata page, in offset order.
+
+    The row count is probed first so page offsets are known up front; up to
+    FETCH_WORKERS pages are then downloaded and parsed ahead of the consumer.
+    """
+    offsets = iter(range(0, _count_rows(start, end), CHUNK_ROWS))
+
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        window = deque(
+            pool.submit(_fetch_page, start, end, off)
+            for off in islice(offsets, FETCH_WORKERS)
+        )
+        while window:
+            table = window.popleft().result()
+            for off in islice(offsets, 1):
+                window.append(pool.submit(_fetch_page, start, end, off))
+            if table.num_rows:
+                yield table
+
+
 def extract_to_parquet(start: str,
                        end: str,
                        dest_dir: Path = TMP_DIR / "raw") -> List[Path]:
@@ -41,20 +116,19 @@ def extract_to_parquet(start: str,
     dest_dir.mkdir(parents=True, exist_ok=True)
     paths: List[Path] = []
 
-    offset = 0
-    page_no = 0
-    while True:
-        df = _fetch_page(start, end, offset)
-        if df.empty:
-            break
-
+    total = 0
+    for page_no, table in enumerate(iter_pages(start, end)):
         path = dest_dir / f"chunk_{page_no:05d}.parquet"
-        df.to_parquet(path, index=False)
+        # write aside, then rename: a crash never leaves a truncated chunk
+        # under the name transform globs for
+        tmp = path.with_suffix(".parquet.tmp")
+        pq.write_table(table, tmp, row_group_size=BATCH_ROWS,
+                       **PARQUET_WRITE_OPTS)
+        os.replace(tmp, path)
         paths.append(path)
 
-        print(f"saved {len(df):>6,} rows → {path.name}")
-        offset += len(df)
-        page_no += 1
+        print(f"saved {table.num_rows:>6,} rows → {path.name}")
+        total += table.num_rows
 
-    print(f"✔ extracted {offset:,} rows in {len(paths)} chunks")
+    print(f"✔ extracted {total:,} rows in {len(paths)} chunks")
     return paths
@@ -4,26 +4,47 @@ COPY-load Parquet chunks into PostgreSQL in O(chunk_size) memory.
 
 from __future__ import annotations
 
-import io
+import re
 import time
+from itertools import chain
+from decimal import Decimal
 from pathlib import Path
-from typing import List
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
-import psycopg2
-from psycopg2.extensions import connection, cursor
+import psycopg
+from psycopg import sql
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as fs
+import pyarrow.parquet as pq
+from psycopg.copy import QueuedLibpqWriter
 
 from src.config import (
     POSTGRES_HOST, POSTGRES_PORT, POSTGRES_DB,
     POSTGRES_USER, POSTGRES_PASSWORD,
-    CHUNK_ROWS,
+    BATCH_ROWS,
 )
+from src.schema import CLEAN_DATASET_SCHEMA, PARTITIONING
 
-_DDL_FILE = Path("include/sql/create_table.sql")
+_DDL_FILE = (Path(__file__).resolve().parents[1]
+             / "include" / "sql" / "create_table.sql")
+_DDL      = _DDL_FILE.read_text()     # read once at import
 
+# pg_get_indexdef() output → idempotent CREATE INDEX
+_IF_NOT_EXISTS = re.compile(r"^(CREATE (?:UNIQUE )?INDEX) ")
 
-def _get_conn() -> connection:
-    return psycopg2.connect(
+# bulk-load settings, scoped to the load transaction by SET LOCAL
+_BULK_SETTINGS = (
+    "SET LOCAL synchronous_commit = OFF",
+    "SET LOCAL work_mem = '256MB'",
+    "SET LOCAL maintenance_work_mem = '1GB'",
+)
+
+
+def _get_conn() -> psycopg.Connection:
+    return psycopg.connect(
         host=POSTGRES_HOST,
         port=POSTGRES_PORT,
         dbname=POSTGRES_DB,
@@ -32,35 +53,250 @@ def _get_conn() -> connection:
     )
 
 
-def _copy_df(cur: cursor, df: pd.DataFrame, table: str) -> None:
-    buf = io.BytesIO()
-    df.to_csv(buf, index=False, header=False,
-              sep=",", na_rep="\\N")
-    buf.seek(0)
-    cur.copy_expert(
-        f"COPY {table} ({','.join(df.columns)}) "
-        "FROM STDIN WITH (FORMAT CSV, DELIMITER ',', NULL '\\N')",
-        file=buf,
+def _column_types(cur: psycopg.Cursor, table: str) -> Dict[str, str]:
+    """Map column name → Postgres type name (``typname``) for *table*."""
+    # resolved through regclass like COPY itself, so a same-named table in
+    # another schema can't leak its columns in
+    cur.execute(
+        "SELECT a.attname, t.typname "
+        "FROM pg_attribute a JOIN pg_type t ON t.oid = a.atttypid "
+        "WHERE a.attrelid = %s::regclass AND a.attnum > 0 "
+        "AND NOT a.attisdropped",
+        (table,),
     )
+    return dict(cur.fetchall())
 
 
-def copy_parquet_chunks(paths: List[Path],
-                        table: str = "iowa_liquor_sales") -> None:
+def _secondary_indexes(cur: psycopg.Cursor,
+                       table: str) -> List[Tuple[str, str]]:
+    """(name, definition) of *table*'s indexes that don't back a constraint."""
+    cur.execute(
+        "SELECT i.relname, pg_get_indexdef(i.oid) "
+        "FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid "
+        "WHERE x.indrelid = %s::regclass AND NOT EXISTS ("
+        "  SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)",
+        (table,),
+    )
+    return cur.fetchall()
+
+
+# binary COPY needs the exact Python type psycopg dumps for each Postgres type
+_PY_TYPES: Dict[str, Callable[[Any], Any]] = {
+    "int4":      int,
+    "int8":      int,
+    "float8":    float,
+    # str() of a float is its shortest round-trip repr, so 12.34 stays 12.34
+    "numeric":   lambda v: Decimal(str(v)),
+    # to_pylist already yields datetime for timestamp[us]
+    "timestamp": lambda v: v,
+    "text":      str,
+    "varchar":   str,
+}
+
+
+def _adapt_array(arr: pa.Array, to_py: Callable[[Any], Any]) -> Any:
+    # convert each distinct value once; NULL indices pick the trailing None
+    enc = arr.dictionary_encode()
+    values = np.array([to_py(v) for v in enc.dictionary.to_pylist()] + [None],
+                      dtype=object)
+    return values[enc.indices.fill_null(-1).to_numpy()]
+
+
+def _copy_plan(
+    names: List[str], types: Dict[str, str],
+) -> Tuple[List[str], List[Callable[[Any], Any]]]:
+    # the per-column plan is fixed once per COPY: set_types pins one C
+    # dumper per column and to_py one value converter, so the row loop
+    # never looks at a type
+    pg_types = [types[c] for c in names]
+    unsupported = sorted({t for t in pg_types if t not in _PY_TYPES})
+    if unsupported:
+        raise ValueError(f"no COPY converter for {', '.join(unsupported)}")
+    return pg_types, [_PY_TYPES[t] for t in pg_types]
+
+
+def _write_chunk(cp: psycopg.Copy, chunk: pa.RecordBatchReader,
+                 names: List[str],
+                 to_py: List[Callable[[Any], Any]]) -> int:
+    n = 0
+    for batch in chunk:
+        batch = batch.select(names)         # same column order as the COPY
+        cols = [_adapt_array(batch.column(i), f) for i, f in enumerate(to_py)]
+        for row in zip(*cols):
+            cp.write_row(row)
+        n += batch.num_rows
+    return n
+
+
+def create_table() -> None:
+    """Run the target-table DDL (idempotent)."""
+    with _get_conn() as conn:
+        conn.execute(_DDL)
+
+
+def _drop_secondary_indexes(cur: psycopg.Cursor, table: str) -> List[str]:
+    indexes = _secondary_indexes(cur, table)
+    for name, _ in indexes:
+        cur.execute(sql.SQL("DROP INDEX {}").format(sql.Identifier(name)))
+    return [ddl for _, ddl in indexes]
+
+
+def drop_secondary_indexes(table: str = "iowa_liquor_sales") -> None:
+    """
+    Drop *table*'s secondary indexes ahead of parallel loads.
+
+    Their definitions are saved to ``etl_dropped_indexes`` in the same
+    transaction, so :func:`create_indexes` can restore them even if an
+    earlier run never got that far.
+    """
+    with _get_conn() as conn, conn.cursor() as cur:
+        for ddl in _drop_secondary_indexes(cur, table):
+            cur.execute(
+                "INSERT INTO etl_dropped_indexes (table_name, ddl) "
+                "VALUES (%s, %s)",
+                (table, ddl),
+            )
+
+
+def create_indexes(table: str = "iowa_liquor_sales") -> None:
+    """Recreate every index saved by :func:`drop_secondary_indexes`."""
+    with _get_conn() as conn, conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('etl_dropped_indexes')")
+        if cur.fetchone()[0] is None:           # DDL never ran – nothing saved
+            return
+        cur.execute("SET LOCAL maintenance_work_mem = '1GB'")
+        # the rows are deleted in the same transaction as the builds, so a
+        # failed build (say, a unique index over duplicates) keeps them
+        cur.execute(
+            "DELETE FROM etl_dropped_indexes WHERE table_name = %s "
+            "RETURNING ddl",
+            (table,),
+        )
+        for (ddl,) in cur.fetchall():
+            cur.execute(_IF_NOT_EXISTS.sub(r"\1 IF NOT EXISTS ", ddl, count=1))
+
+
+def _copy_chunks(chunks: Iterable[pa.RecordBatchReader],
+                 table: str,
+                 n_chunks: Optional[int] = None,
+                 rebuild_indexes: bool = True,
+                 run_ddl: bool = True) -> None:
     total = 0
     t0 = time.perf_counter()
+    of = f"/{n_chunks}" if n_chunks is not None else ""
+
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if first is None:
+        print("✔ nothing to load")
+        return
+    names = first.schema.names
 
     with _get_conn() as conn, conn.cursor() as cur:
-        # create table once
-        cur.execute(_DDL_FILE.read_text())
-        conn.commit()
+        # callers that ran create_table() up front (the DAG) skip this
+        if run_ddl:
+            cur.execute(_DDL)
+            conn.commit()
+        types = _column_types(cur, table)
+        pg_types, to_py = _copy_plan(names, types)
+
+        for stmt in _BULK_SETTINGS:
+            cur.execute(stmt)
 
-        for i, path in enumerate(paths, 1):
-            df = pd.read_parquet(path)
-            _copy_df(cur, df, table)
-            total += len(df)
-            print(f"COPY {i}/{len(paths)}  +{len(df):,} rows  "
-                  f"(cum {total:,})")
+        # rebuilding secondary indexes once beats per-row B-tree updates;
+        # it all happens in one transaction, so a failed load restores them.
+        # Concurrent loaders must skip this (DROP INDEX locks the table) and
+        # use drop_secondary_indexes / create_indexes around the whole load.
+        indexes = _drop_secondary_indexes(cur, table) if rebuild_indexes else []
+
+        # one COPY for every chunk – a single CopyIn handshake and stream;
+        # the queued writer ships buffers from a worker thread while rows
+        # are still being formatted here
+        with cur.copy(
+            f"COPY {table} ({','.join(names)}) "
+            "FROM STDIN WITH (FORMAT BINARY)",
+            writer=QueuedLibpqWriter(cur),
+        ) as cp:
+            cp.set_types(pg_types)
+            for i, chunk in enumerate(chain([first], chunks), 1):
+                n = _write_chunk(cp, chunk, names, to_py)
+                total += n
+                print(f"COPY {i}{of}  +{n:,} rows  "
+                      f"(cum {total:,})")
+
+        for ddl in indexes:
+            cur.execute(ddl)
 
         conn.commit()
 
     print(f"✔ loaded {total:,} rows in {time.perf_counter()-t0:.1f}s")
+
+
+def copy_tables(tables: Iterable[pa.Table],
+                table: str = "iowa_liquor_sales") -> None:
+    """
+    COPY an iterable of Arrow tables into *table* in one transaction.
+    Tables are pulled lazily, so a generator keeps memory at one chunk.
+    """
+    _copy_chunks((t.to_reader() for t in tables), table)
+
+
+def _read_chunk(path: Path) -> pa.RecordBatchReader:
+    # local chunk files are memory-mapped, so Arrow decodes straight from
+    # the page cache instead of a private read buffer; pre_buffer still
+    # coalesces each row group's column chunks into one range
+    pf = pq.ParquetFile(path, memory_map=True, pre_buffer=True)
+    return pa.RecordBatchReader.from_batches(
+        pf.schema_arrow,
+        pf.iter_batches(batch_size=BATCH_ROWS, use_threads=True),
+    )
+
+
+def copy_parquet_chunks(paths: List[Path],
+                        table: str = "iowa_liquor_sales",
+                        rebuild_indexes: bool = True,
+                        run_ddl: bool = True) -> None:
+    # stream Arrow record batches – no full-file pandas DataFrame per chunk
+    _copy_chunks((_read_chunk(p) for p in paths), table, len(paths),
+                 rebuild_indexes, run_ddl)
+
+
+def copy_parquet_dataset(root: Path,
+                         start: Optional[str] = None,
+                         end: Optional[str] = None,
+                         table: str = "iowa_liquor_sales",
+                         rebuild_indexes: bool = False,
+                         run_ddl: bool = True) -> None:
+    """
+    COPY the rows of the year/month-partitioned dataset at *root* whose date
+    falls in [start, end]. Partitions outside the range are never opened.
+
+    Meant for topping up an existing table, so indexes are kept by default:
+    a rebuild re-sorts the whole table under an ACCESS EXCLUSIVE lock.
+    """
+    dset = ds.dataset(root, format="parquet", partitioning=PARTITIONING,
+                      schema=CLEAN_DATASET_SCHEMA,
+                      filesystem=fs.LocalFileSystem(use_mmap=True))
+    # (year, month) comparisons prune whole directories; the date
+    # comparisons trim rows in the boundary months
+    ym   = ds.field("year").cast(pa.int32()) * 100 + ds.field("month")
+    date = ds.field("date")
+    expr = ds.scalar(True)
+    if start is not None:
+        lo = pd.Timestamp(start)
+        expr &= (ym >= lo.year * 100 + lo.month) & (date >= _ts(lo))
+    if end is not None:
+        hi = pd.Timestamp(end)
+        # the whole end day, like extract's BETWEEN ... 'T23:59:59'
+        expr &= ((ym <= hi.year * 100 + hi.month)
+                 & (date < _ts(hi + pd.Timedelta(days=1))))
+
+    cols = [n for n in dset.schema.names if n not in ("year", "month")]
+    reader = dset.scanner(columns=cols, filter=expr,
+                          batch_size=BATCH_ROWS).to_reader()
+    _copy_chunks([reader], table, rebuild_indexes=rebuild_indexes,
+                 run_ddl=run_ddl)
+
+
+def _ts(t: pd.Timestamp) -> pa.Scalar:
+    return pa.scalar(t.to_pydatetime(), pa.timestamp("us"))
@@ -0,0 +1,54 @@
+"""
+Fused extract → transform → load for one-shot runs outside Airflow.
+
+Pages stay in memory between stages – no Parquet intermediates – and the
+next page is fetched while the current one is being COPY'd.
+"""
+
+from __future__ import annotations
+
+import queue
+import sys
+import threading
+from typing import Iterable, Iterator, TypeVar
+
+from src.extract import iter_pages
+from src.load import copy_tables
+from src.transform import _clean_chunk
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+def _prefetch(items: Iterable[T], depth: int = 2) -> Iterator[T]:
+    """Drain *items* on a background thread, keeping up to *depth* ready."""
+    q: queue.Queue = queue.Queue(maxsize=depth)
+
+    def produce() -> None:
+        try:
+            for item in items:
+                q.put(item)
+        except BaseException as exc:            # re-raised in the consumer
+            q.put(exc)
+        else:
+            q.put(_DONE)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while (item := q.get()) is not _DONE:
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+
+def run_pipeline(start: str, end: str,
+                 table: str = "iowa_liquor_sales") -> None:
+    pages = _prefetch(
+        _clean_chunk(t) for t in iter_pages(start, end)
+    )
+    copy_tables(pages, table)
+
+
+if __name__ == "__main__":
+    # python -m src.pipeline 2020-01-01 2025-06-30
+    run_pipeline(*sys.argv[1:3])
@@ -0,0 +1,40 @@
+"""
+Column groups and Arrow schemas shared by the extract, transform and load stages.
+"""
+
+from __future__ import annotations
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+INT_COLS   = ["pack", "bottle_volume_ml", "sale_bottles"]
+FLOAT_COLS = [
+    "state_bottle_cost", "state_bottle_retail",
+    "sale_dollars", "sale_liters", "sale_gallons",
+]
+# low-cardinality labels (~2k stores, ~100 categories) – kept dictionary-encoded
+CAT_COLS = ["name", "city", "county", "category_name", "vendor_name", "im_desc"]
+# the DDL's other TEXT columns – always string, even when a page's values
+# all look numeric (zipcode '52240' on one page, '52240-1' on the next)
+TEXT_COLS = [
+    "invoice_line_no", "store", "address", "zipcode", "store_location",
+    "county_number", "category", "vendor_no", "itemno",
+]
+
+# Arrow type of every table column after cleaning
+CLEAN_TYPES = {
+    "date": pa.timestamp("us"),
+    **{c: pa.string() for c in TEXT_COLS},
+    **{c: pa.dictionary(pa.int32(), pa.string()) for c in CAT_COLS},
+    **{c: pa.int32() for c in INT_COLS},
+    **{c: pa.float64() for c in FLOAT_COLS},
+}
+
+# clean chunks land in TMP_DIR/clean/year=YYYY/month=M/ so readers can prune
+# by date; the key columns live in the path, not in the files
+PARTITION_SCHEMA = pa.schema([("year", pa.int16()), ("month", pa.int8())])
+PARTITIONING     = ds.partitioning(PARTITION_SCHEMA, flavor="hive")
+
+# one schema for the whole clean dataset, whichever file is found first
+CLEAN_DATASET_SCHEMA = pa.schema(
+    list(CLEAN_TYPES.items()) + list(PARTITION_SCHEMA))
@@ -4,37 +4,143 @@ Stateless per-chunk transformation helpers.
 
 from __future__ import annotations
 
-import pandas as pd
+import os
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
 from typing import List
 
-def _clean_chunk(df: pd.DataFrame) -> pd.DataFrame:
-    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+from src.config import BATCH_ROWS, PARQUET_WRITE_OPTS, TRANSFORM_WORKERS
+from src.schema import (
+    CAT_COLS, CLEAN_TYPES, FLOAT_COLS, INT_COLS, PARTITION_SCHEMA,
+    PARTITIONING, TEXT_COLS,
+)
 
-    # example numeric coercions – adapt as needed
-    num_cols = [
-        "pack", "bottle_volume_ml", "state_bottle_cost",
-        "state_bottle_retail", "sale_bottles",
-        "sale_dollars", "sale_liters", "sale_gallons",
-    ]
-    for c in num_cols:
-        df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0)
+_FILE_OPTS = ds.ParquetFileFormat().make_write_options(**PARQUET_WRITE_OPTS)
 
-    return df
+# plain decimal / scientific notation, as pd.to_numeric accepts
+_NUMBER_RE = r"^[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$"
 
 
-def transform_parquet_chunks(src_paths: List[Path],
-                             dest_dir: Path) -> List[Path]:
+def _to_timestamp(col: pa.ChunkedArray) -> pa.ChunkedArray:
+    if pa.types.is_timestamp(col.type):
+        return col.cast(pa.timestamp("us"), safe=False)
+    # Socrata serves floating timestamps as ISO 8601 – fixed-format parse,
+    # unparseable values become NULL
+    col = col.cast(pa.string())
+    return pc.coalesce(
+        pc.strptime(pc.utf8_slice_codeunits(col, 0, 19),
+                    format="%Y-%m-%dT%H:%M:%S", unit="us", error_is_null=True),
+        pc.strptime(pc.utf8_slice_codeunits(col, 0, 10),
+                    format="%Y-%m-%d", unit="us", error_is_null=True),
+    )
+
+
+def _to_float64(col: pa.ChunkedArray) -> pa.ChunkedArray:
+    if pa.types.is_string(col.type) or pa.types.is_large_string(col.type):
+        # a stray non-number makes the CSV reader keep text – NULL it out
+        col = pc.utf8_trim_whitespace(col)
+        col = pc.if_else(pc.match_substring_regex(col, _NUMBER_RE),
+                         col, pa.scalar(None, col.type))
+    col = pc.cast(col, pa.float64(), safe=False)
+    # NaN counts as missing, as it did for pandas' fillna
+    return pc.fill_null(
+        pc.if_else(pc.is_nan(col), pa.scalar(None, pa.float64()), col), 0.0)
+
+
+def _clean_chunk(table: pa.Table) -> pa.Table:
+    cols = []
+    for name in table.column_names:
+        col = table[name]
+        if name == "date":
+            col = _to_timestamp(col)
+        elif name in INT_COLS:
+            # counts fit int32 (the table columns are INTEGER); truncates
+            # like astype
+            col = pc.cast(_to_float64(col), pa.int32(), safe=False)
+        elif name in FLOAT_COLS:
+            # money stays float64 – float32 keeps only ~7 significant digits
+            col = _to_float64(col)
+        elif name in TEXT_COLS:
+            col = col.cast(pa.string())
+        elif name in CAT_COLS:
+            # labels arrive padded (' Hy-Vee #10 '); trimming before the
+            # encode also merges values that differ only in padding
+            col = pc.dictionary_encode(
+                pc.utf8_trim_whitespace(col.cast(pa.string())))
+        cols.append(col)
+    return pa.Table.from_arrays(cols, names=table.column_names)
+
+
+def _clean_schema(src: pa.Schema) -> pa.Schema:
+    """Output schema of :func:`_clean_chunk` for a raw chunk schema."""
+    return pa.schema([(f.name, CLEAN_TYPES.get(f.name, f.type)) for f in src])
+
+
+def _with_partition_keys(table: pa.Table) -> pa.Table:
+    date = table["date"]
+    return (table
+            .append_column("year", pc.year(date).cast(pa.int16()))
+            .append_column("month", pc.month(date).cast(pa.int8())))
+
+
+def transform_chunk(src: Path, dest_dir: Path) -> List[Path]:
+    """
+    Clean one raw chunk file into the partitioned dataset at *dest_dir*.
+    Returns the files written – one per (year, month) the chunk touches.
+    """
     dest_dir.mkdir(parents=True, exist_ok=True)
-    out_paths: List[Path] = []
+    # pre_buffer coalesces each row group's column chunks into one read
+    pf = pq.ParquetFile(src, pre_buffer=True)
+    # fixed up front so an all-NULL batch can't narrow a column to null type
+    schema = _clean_schema(pf.schema_arrow)
+
+    batches = (
+        b
+        for raw in pf.iter_batches(batch_size=BATCH_ROWS, use_threads=True)
+        for b in _with_partition_keys(
+            _clean_chunk(pa.Table.from_batches([raw])).cast(schema)
+        ).to_batches()
+    )
+    written: List[Path] = []          # .tmp names, renamed below
+    ds.write_dataset(
+        pa.RecordBatchReader.from_batches(
+            pa.schema(list(schema) + list(PARTITION_SCHEMA)), batches),
+        dest_dir,
+        format="parquet",
+        partitioning=PARTITIONING,
+        file_options=_FILE_OPTS,
+        # chunk_<n>-<i>: unique per chunk, so parallel transforms can share
+        # one dataset directory. Files are written under hidden .tmp names,
+        # which dataset discovery and the chunk glob both skip, and renamed
+        # once complete – a crashed transform leaves no corrupt chunk behind
+        basename_template=f".{src.stem}-{{i}}.parquet.tmp",
+        existing_data_behavior="overwrite_or_ignore",
+        max_rows_per_file=1_000_000,
+        min_rows_per_group=BATCH_ROWS,
+        max_rows_per_group=BATCH_ROWS,
+        file_visitor=lambda f: written.append(Path(f.path)),
+    )
+    out = []
+    for tmp in written:
+        final = tmp.with_name(tmp.name[1:].removesuffix(".tmp"))
+        os.replace(tmp, final)
+        out.append(final)
+    return sorted(out)
 
-    for p in src_paths:
-        df = pd.read_parquet(p)
-        df_t = _clean_chunk(df)
 
-        out = dest_dir / p.name           # keep chunk_<n>.parquet
-        df_t.to_parquet(out, index=False)
-        out_paths.append(out)
+def transform_parquet_chunks(src_paths: List[Path],
+                             dest_dir: Path) -> List[Path]:
+    # chunks are independent – clean them in parallel, keep input order
+    with ProcessPoolExecutor(max_workers=TRANSFORM_WORKERS) as pool:
+        out_paths = [p for paths in pool.map(transform_chunk, src_paths,
+                                             repeat(dest_dir))
+                     for p in paths]
 
-    print(f"✔ transformed {len(out_paths)} chunks")
+    print(f"✔ transformed {len(src_paths)} chunks into {len(out_paths)} files")
     return out_paths
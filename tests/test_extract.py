@@ -1,13 +1,48 @@
 import sys
 import os
+import random
+import time
+
+import pyarrow as pa
+import pytest
+
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from src.extract import extract_iowa_liquor_sales
+from src import extract
 
 def test_extract():
+    from src.extract import extract_iowa_liquor_sales
     df = extract_iowa_liquor_sales("2020-01-01", "2020-01-02")
     assert not df.empty
     assert "invoice_line_no" in df.columns
 
+def _fake_socrata(monkeypatch, n_rows, fail_at=None):
+    monkeypatch.setattr(extract, "CHUNK_ROWS", 10)
+    monkeypatch.setattr(extract, "FETCH_WORKERS", 4)
+    monkeypatch.setattr(extract, "_count_rows", lambda start, end: n_rows)
+
+    def fetch(start, end, offset):
+        # random latency so later pages often finish first
+        time.sleep(random.uniform(0, 0.01))
+        if offset == fail_at:
+            raise RuntimeError(f"page at {offset} failed")
+        return pa.table({"offset": [offset] * min(10, n_rows - offset)})
+    monkeypatch.setattr(extract, "_fetch_page", fetch)
+
+def test_iter_pages_keeps_offset_order(monkeypatch):
+    _fake_socrata(monkeypatch, n_rows=205)
+    pages = list(extract.iter_pages("2020-01-01", "2020-01-02"))
+    assert [p["offset"][0].as_py() for p in pages] == list(range(0, 205, 10))
+    assert sum(p.num_rows for p in pages) == 205
+
+def test_iter_pages_empty_range(monkeypatch):
+    _fake_socrata(monkeypatch, n_rows=0)
+    assert list(extract.iter_pages("2020-01-01", "2020-01-02")) == []
+
+def test_iter_pages_propagates_fetch_error(monkeypatch):
+    _fake_socrata(monkeypatch, n_rows=100, fail_at=50)
+    with pytest.raises(RuntimeError, match="page at 50 failed"):
+        list(extract.iter_pages("2020-01-01", "2020-01-02"))
+
 if __name__ == "__main__":
     test_extract()
     print("Extract test passed.")
@@ -1,11 +1,20 @@
 import sys
 import os
+from datetime import datetime
+from decimal import Decimal
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from src.extract import extract_iowa_liquor_sales
-from src.transform import transform_iowa_liquor_data
-from src.load import load_to_postgres, get_pg_conn
+from src import load
+from src.transform import transform_chunk
 
 def test_load():
+    from src.extract import extract_iowa_liquor_sales
+    from src.transform import transform_iowa_liquor_data
+    from src.load import load_to_postgres, get_pg_conn
     df = extract_iowa_liquor_sales("2020-01-01", "2020-01-02")
     df_t = transform_iowa_liquor_data(df)
     load_to_postgres(df_t)
@@ -17,6 +26,83 @@ def test_load():
     cursor.close()
     conn.close()
 
+def test_copy_parquet_dataset_date_range(tmp_path, monkeypatch):
+    dates = {
+        "feb-14-last":  datetime(2020, 2, 14, 23, 59, 59),
+        "feb-15-first": datetime(2020, 2, 15),
+        "mar-10-last":  datetime(2020, 3, 10, 23, 59, 59),
+        "mar-11-first": datetime(2020, 3, 11),
+        "no-date":      None,
+    }
+    raw = tmp_path / "chunk_00000.parquet"
+    pq.write_table(pa.table({
+        "invoice_line_no": list(dates),
+        "date": pa.array(list(dates.values()), pa.timestamp("us")),
+    }), raw)
+    clean = tmp_path / "clean"
+    written = transform_chunk(raw, clean)
+    assert any("__HIVE_DEFAULT_PARTITION__" in str(p) for p in written)
+
+    # a partition outside the range would fail the scan if it were opened
+    outside = clean / "year=2020" / "month=4"
+    outside.mkdir(parents=True)
+    (outside / "chunk_00001-0.parquet").write_bytes(b"not parquet")
+
+    loaded, flags = [], {}
+    def fake_copy(chunks, table, **kw):
+        flags.update(kw)
+        loaded.extend(r.read_all()["invoice_line_no"].to_pylist()
+                      for r in chunks)
+    monkeypatch.setattr(load, "_copy_chunks", fake_copy)
+    load.copy_parquet_dataset(clean, "2020-02-15", "2020-03-10")
+    assert sorted(sum(loaded, [])) == ["feb-15-first", "mar-10-last"]
+    # a range top-up keeps the table's indexes
+    assert flags["rebuild_indexes"] is False
+
+class _RecordingCopy:
+    """Stands in for psycopg's Copy: keeps every row written."""
+    def __init__(self):
+        self.rows = []
+
+    def write_row(self, row):
+        self.rows.append(tuple(row))
+
+def test_adapt_array_converts_each_distinct_value_once():
+    calls = []
+    def to_py(v):
+        calls.append(v)
+        return v.upper()
+    out = load._adapt_array(pa.array(["a", None, "a", "b", None]), to_py)
+    assert list(out) == ["A", None, "A", "B", None]
+    assert sorted(calls) == ["a", "b"]
+    # dictionary-encoded label columns take the same path
+    dict_arr = pa.array(["x", "x", None]).dictionary_encode()
+    assert list(load._adapt_array(dict_arr, str)) == ["x", "x", None]
+
+def test_write_chunk_follows_the_copy_plan():
+    types = {"invoice_line_no": "text", "pack": "int4",
+             "sale_dollars": "numeric", "date": "timestamp"}
+    names = ["invoice_line_no", "date", "pack", "sale_dollars"]
+    _, to_py = load._copy_plan(names, types)
+    chunk = pa.table({
+        # file column order differs from the COPY column list
+        "sale_dollars": [12.34, None],
+        "pack": pa.array([6, 12], pa.int32()),
+        "date": pa.array([datetime(2020, 1, 2), None], pa.timestamp("us")),
+        "invoice_line_no": ["INV-1", "INV-2"],
+    }).to_reader()
+    cp = _RecordingCopy()
+    assert load._write_chunk(cp, chunk, names, to_py) == 2
+    assert cp.rows == [
+        ("INV-1", datetime(2020, 1, 2), 6, Decimal("12.34")),
+        ("INV-2", None, 12, None),
+    ]
+    assert type(cp.rows[0][3]) is Decimal
+
+def test_copy_plan_rejects_unsupported_types():
+    with pytest.raises(ValueError, match="jsonb"):
+        load._copy_plan(["a", "b"], {"a": "text", "b": "jsonb"})
+
 if __name__ == "__main__":
     test_load()
     print("Load test passed.")
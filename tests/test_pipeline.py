@@ -0,0 +1,32 @@
+import sys
+import os
+import time
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.pipeline import _prefetch
+
+def test_prefetch_keeps_order():
+    def slow():
+        for i in range(10):
+            time.sleep(0.001 * (i % 3))
+            yield i
+    assert list(_prefetch(slow(), depth=2)) == list(range(10))
+
+def test_prefetch_reraises_producer_error():
+    def failing():
+        yield 1
+        yield 2
+        raise RuntimeError("page 3 failed")
+    got = []
+    with pytest.raises(RuntimeError, match="page 3 failed"):
+        for item in _prefetch(failing()):
+            got.append(item)
+    # everything produced before the failure still reaches the consumer
+    assert got == [1, 2]
+
+if __name__ == "__main__":
+    test_prefetch_keeps_order()
+    test_prefetch_reraises_producer_error()
+    print("Pipeline test passed.")
@@ -1,15 +1,61 @@
 import sys
 import os
+from datetime import datetime
+
+import pyarrow as pa
+
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from src.extract import extract_iowa_liquor_sales
-from src.transform import transform_iowa_liquor_data
+from src.transform import _clean_chunk, _clean_schema
 
 def test_transform():
+    from src.extract import extract_iowa_liquor_sales
+    from src.transform import transform_iowa_liquor_data
     df = extract_iowa_liquor_sales("2020-01-01", "2020-01-02")
     df_t = transform_iowa_liquor_data(df)
     assert "date" in df_t.columns
     assert df_t.isnull().sum().sum() == 0
 
+def test_clean_chunk_coerces_numbers():
+    t = _clean_chunk(pa.table({
+        "pack":         ["x", "", "12.9", None],
+        "sale_dollars": [float("nan"), 1.5, None, 2.0],
+    }))
+    assert t.schema.field("pack").type == pa.int32()
+    assert t["pack"].to_pylist() == [0, 0, 12, 0]
+    assert t["sale_dollars"].to_pylist() == [0.0, 1.5, 0.0, 2.0]
+
+def test_clean_chunk_trims_labels():
+    t = _clean_chunk(pa.table({"name": [" Hy-Vee #3 ", "Hy-Vee #3", None]}))
+    assert pa.types.is_dictionary(t.schema.field("name").type)
+    assert t["name"].to_pylist() == ["Hy-Vee #3", "Hy-Vee #3", None]
+    # padding variants share one dictionary entry
+    assert t["name"].chunk(0).dictionary.to_pylist() == ["Hy-Vee #3"]
+
+def test_clean_chunk_keeps_null_dates():
+    t = _clean_chunk(pa.table({
+        "date": ["2020-01-02T00:00:00.000", None, "not a date", "2020-03-04"],
+    }))
+    assert t["date"].to_pylist() == [
+        datetime(2020, 1, 2), None, None, datetime(2020, 3, 4),
+    ]
+    t = _clean_chunk(pa.table({
+        "date": pa.array([datetime(2020, 1, 2), None], pa.timestamp("us")),
+    }))
+    assert t["date"].to_pylist() == [datetime(2020, 1, 2), None]
+
+def test_clean_chunk_all_null_batch_matches_schema():
+    raw = pa.schema([
+        ("invoice_line_no", pa.string()), ("date", pa.timestamp("us")),
+        ("name", pa.string()), ("pack", pa.int64()),
+        ("sale_dollars", pa.float64()),
+    ])
+    # a page where every value is missing comes back null-typed
+    batch = pa.table({f.name: pa.nulls(3) for f in raw})
+    t = _clean_chunk(batch).cast(_clean_schema(raw))
+    assert t.schema == _clean_schema(raw)
+    assert t["pack"].to_pylist() == [0, 0, 0]
+    assert t["date"].null_count == 3
+
 if __name__ == "__main__":
     test_transform()
     print("Transform test passed.")